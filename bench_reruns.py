@@ -0,0 +1,142 @@
+"""Time MyTracker's page reruns on a realistic dataset.
+
+Seeds the in-memory Sheets stand-in (fake_sheets.py) with about a year of
+data for 30 employees, logs in as the admin through Streamlit's AppTest and
+times two interactions:
+
+- picking another client under "Assets per client" on Workload details;
+- rerunning My timesheet, which is what every edit in its production
+  editor used to cost.
+
+Both are timed as full-page reruns (AppTest cannot run a single fragment),
+so the numbers are comparable across checkouts. ``--app`` points it at
+another checkout's time_tracker.py, e.g. a ``git worktree`` of an older
+commit; checkouts from before the fake backend existed get the stand-in by
+patching gspread.
+
+    python bench_reruns.py --runs 20
+    python bench_reruns.py --app ../mytracker-old/time_tracker.py
+"""
+
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+os.environ["MYTRACKER_BACKEND"] = "fake"
+
+USERS = 30
+CLIENTS = 40
+WEEKS = 40
+PRODUCTION_ROWS = 3000
+
+
+def install_fake_backend():
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+
+    import fake_sheets
+
+    gspread.authorize = lambda creds: fake_sheets.get_client()
+    ServiceAccountCredentials.from_json_keyfile_name = classmethod(lambda cls, *args, **kwargs: None)
+    return fake_sheets.reset()
+
+
+def seed(sheet):
+    rng = random.Random(1)
+    week0 = date.today() - timedelta(days=date.today().weekday())
+
+    def tab(title, rows):
+        sheet.add_worksheet(title, len(rows), len(rows[0])).rows = rows
+
+    # Plain-text passwords: older checkouts compare them as-is, newer ones upgrade them on login.
+    tab("Users", [["id", "name", "username", "password", "role", "date_added"], [1, "Administrator", "admin", "admin", "Admin", ""]]
+        + [[i, f"Employee {i}", f"user{i}", f"pw{i}", "Employee", ""] for i in range(2, USERS + 2)])
+    tab("Clients", [["id", "name", "date_added"]] + [[i, f"Client {i}", ""] for i in range(1, CLIENTS + 1)])
+    tab("Assets", [["id", "name", "date_added"]] + [[i, f"Asset {i}", ""] for i in range(1, 11)])
+    tab("CreativeTypes", [["id", "name", "date_added"]] + [[i, f"Type {i}", ""] for i in range(1, 5)])
+
+    time_rows = [["user_id", "client_id", "date", "hours", "week_start"]]
+    for uid in range(1, USERS + 2):
+        for w in range(WEEKS):
+            week = week0 - timedelta(weeks=w)
+            for _ in range(5):
+                day = week + timedelta(days=rng.randint(0, 4))
+                time_rows.append([uid, rng.randint(1, CLIENTS), str(day), 1.5, str(week)])
+    tab("TimeEntries", time_rows)
+
+    prod_rows = [["user_id", "client_id", "date", "asset_id", "amount", "title", "source_link", "ext_link", "time_spent",
+                  "creative_type_id"]]
+    for n in range(PRODUCTION_ROWS):
+        uid, day = rng.randint(1, USERS + 1), week0 - timedelta(days=rng.randint(0, 60))
+        if n < 15:  # the admin's own week, so My timesheet has a production list to render
+            uid, day = 1, week0 + timedelta(days=n % 5)
+        prod_rows.append([uid, rng.randint(1, CLIENTS), str(day), rng.randint(1, 10), 2, f"Item {n}", "", "", 1,
+                          rng.randint(1, 4)])
+    tab("ProductionEntries", prod_rows)
+    tab("SubmittedWeeks", [["user_id", "week_start", "status", "submitted_at"]])
+    tab("AssetLibrary", [["Title", "Employee", "Client", "Date", "Asset Category", "Creative Type", "Source Link",
+                          "External Link"]])
+
+
+def timed(fn, runs, warmup):
+    samples = []
+    for i in range(warmup + runs):
+        start = time.perf_counter()
+        fn(i)
+        if i >= warmup:
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(name, samples):
+    ordered = sorted(samples)
+    p90 = ordered[min(len(ordered) - 1, int(round(0.9 * (len(ordered) - 1))))]
+    print(f"{name:<40} median {statistics.median(samples):6.0f} ms   p90 {p90:6.0f} ms   (n={len(samples)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "time_tracker.py"))
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--warmup", type=int, default=3)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    app = os.path.abspath(args.app)
+    # The app's own modules (shared_cache etc.) come from its checkout; fake_sheets from this one.
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.path.dirname(app))
+    seed(install_fake_backend())
+
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(app, default_timeout=120)
+    at.run()
+    at.text_input[0].set_value("admin")
+    at.text_input[1].set_value("admin")
+    at.button[0].click()
+    at.run()
+    if at.exception or not at.sidebar.radio:
+        sys.exit(f"login failed: {[e.message for e in at.exception]}")
+
+    at.sidebar.radio[0].set_value("Workload details")
+    at.run()
+
+    def pick_client(i):
+        next(s for s in at.selectbox if s.label == "Select Client").set_value(f"Client {1 + i % CLIENTS}")
+        at.run()
+
+    report("Workload details: pick client", timed(pick_client, args.runs, args.warmup))
+
+    at.sidebar.radio[0].set_value("My timesheet")
+    at.run()
+    report("My timesheet: rerun", timed(lambda i: at.run(), args.runs, args.warmup))
+
+
+if __name__ == "__main__":
+    main()
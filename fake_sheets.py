@@ -0,0 +1,142 @@
+"""In-memory stand-in for the bits of gspread MyTracker uses.
+
+Set ``MYTRACKER_BACKEND=fake`` to run the app (or the concurrency tooling)
+against it instead of Google Sheets. All sessions in the process share one
+spreadsheet, and every call is counted so API usage can be compared.
+
+``FakeSpreadsheet.limit`` switches on simulated per-call latency and
+Sheets-style per-minute read/write quotas; calls over quota raise
+``QuotaExceeded`` the way the real API answers 429.
+"""
+
+import copy
+import threading
+import time
+from collections import Counter, deque
+
+READ_CALLS = {"open_by_url", "worksheets", "worksheet", "get_all_records"}
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, title):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.rows = []
+
+    def get_all_records(self):
+        with self.spreadsheet.call("get_all_records"):
+            if not self.rows:
+                return []
+            header = self.rows[0]
+            return [dict(zip(header, row + [""] * (len(header) - len(row)))) for row in self.rows[1:]]
+
+    def append_row(self, values):
+        with self.spreadsheet.call("append_row"):
+            self.rows.append(list(values))
+
+    def clear(self):
+        with self.spreadsheet.call("clear"):
+            self.rows = []
+
+    @property
+    def row_count(self):
+        return len(self.rows)
+
+    @property
+    def col_count(self):
+        return max([len(r) for r in self.rows] or [1])
+
+    def update(self, values, range_name="A1"):
+        # Only whole rows from A1 down are supported, which is all MyTracker writes.
+        assert range_name == "A1"
+        with self.spreadsheet.call("update"):
+            self.rows[:len(values)] = copy.deepcopy([list(r) for r in values])
+
+    def batch_clear(self, ranges):
+        # Clears rows from the start row of each "A<row>:..." range to the bottom of the sheet.
+        with self.spreadsheet.call("batch_clear"):
+            for cell_range in ranges:
+                start = int("".join(c for c in cell_range.split(":")[0] if c.isdigit()))
+                del self.rows[start - 1:]
+
+
+class FakeSpreadsheet:
+    def __init__(self):
+        self.worksheets_by_title = {}
+        self.limit()
+        self.calls = Counter()
+        self.calls_by_thread = Counter()
+        self.throttled = Counter()
+        self._recent = {"read": deque(), "write": deque()}
+        self._lock = threading.RLock()
+
+    def limit(self, latency=0.0, read_quota=None, write_quota=None, window=60.0):
+        self.latency = latency
+        self.quotas = {"read": read_quota, "write": write_quota}
+        self.window = window
+
+    def reset_usage(self):
+        """Forget every call made so far, including the ones counted against the quota windows."""
+        with self._lock:
+            self.calls.clear()
+            self.calls_by_thread.clear()
+            self.throttled.clear()
+            for recent in self._recent.values():
+                recent.clear()
+
+    def call(self, name):
+        # Counts the call against its quota, waits out the simulated latency and
+        # returns the lock the caller holds while touching the sheet's rows.
+        kind = "read" if name in READ_CALLS else "write"
+        with self._lock:
+            now = time.monotonic()
+            recent = self._recent[kind]
+            while recent and now - recent[0] > self.window:
+                recent.popleft()
+            quota = self.quotas[kind]
+            if quota is not None and len(recent) >= quota:
+                self.throttled[kind] += 1
+                raise QuotaExceeded(f"Quota exceeded for {kind} requests ({quota} per {self.window:g}s)")
+            recent.append(now)
+            self.calls[name] += 1
+            self.calls_by_thread[threading.get_ident()] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self._lock
+
+    def worksheets(self):
+        with self.call("worksheets"):
+            return list(self.worksheets_by_title.values())
+
+    def add_worksheet(self, title, rows, cols):
+        with self.call("add_worksheet"):
+            ws = FakeWorksheet(self, title)
+            self.worksheets_by_title[title] = ws
+            return ws
+
+    def worksheet(self, title):
+        with self.call("worksheet"):
+            return self.worksheets_by_title[title]
+
+
+class FakeClient:
+    def open_by_url(self, url):
+        with SPREADSHEET.call("open_by_url"):
+            return SPREADSHEET
+
+
+SPREADSHEET = FakeSpreadsheet()
+
+
+def reset():
+    global SPREADSHEET
+    SPREADSHEET = FakeSpreadsheet()
+    return SPREADSHEET
+
+
+def get_client():
+    return FakeClient()
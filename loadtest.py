@@ -0,0 +1,263 @@
+"""Load-test MyTracker's data layer with many concurrent simulated sessions.
+
+Runs N employees through the Monday-morning flow (log in, open the week,
+edit hours, save assets, submit, request an unlock) while an admin session
+keeps unlocking requested weeks. Everything runs against the in-memory
+Sheets stand-in in fake_sheets.py, with its per-call latency and per-minute
+quotas switched on.
+
+    python loadtest.py --users 30 --rounds 3 --latency 0.2
+
+It reports p50/p95/p99 latency, the API calls made per action, and how many
+calls were throttled. Flushes to Sheets run on whichever session holds the
+tab's flush lease and often carry other sessions' saves too, so their calls
+are not charged to the save that ran them: they get their own "flush" row
+(counting only flushes that actually called Sheets), and the report also
+gives the flush calls per committed write. It also checks that every employee's last saved
+hours and assets (or a later save of theirs that failed part-way, e.g. on a
+throttled flush) are what ended up in the sheet; anything else is a lost
+update.
+"""
+
+import argparse
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+os.environ["MYTRACKER_BACKEND"] = "fake"
+
+ACTIONS = ["login", "open week", "edit hours", "save assets", "submit", "request unlock", "admin read", "admin unlock",
+           "flush"]
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class Recorder:
+    def __init__(self, sheet):
+        self.sheet = sheet
+        self.latencies = defaultdict(list)
+        self.api_calls = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.failures = Counter()
+        self._lock = threading.Lock()
+        # Calls made by actions nested in the current one on this thread, which it isn't charged for.
+        self._nested = threading.local()
+
+    def run(self, action, fn, *args):
+        result, error = self._record(action, fn, args, keep_idle=True)
+        return None if error else result
+
+    def flush(self, fn, *args):
+        # Recorded only if it called Sheets (most find their version already flushed by another
+        # session), and errors are passed on so the save sees them as it would without the recorder.
+        result, error = self._record("flush", fn, args, keep_idle=False)
+        if error:
+            raise error
+        return result
+
+    def _record(self, action, fn, args, keep_idle):
+        thread = threading.get_ident()
+        calls_before = self.sheet.calls_by_thread[thread]
+        outer_nested = getattr(self._nested, "calls", 0)
+        self._nested.calls = 0
+        start = time.perf_counter()
+        result, error, failure = None, None, None
+        try:
+            result = fn(*args)
+            if result is None and keep_idle:
+                failure = "refused (week changed since it was read)"
+        except Exception as e:
+            error, failure = e, type(e).__name__
+        elapsed = time.perf_counter() - start
+        total = self.sheet.calls_by_thread[thread] - calls_before
+        own = total - self._nested.calls
+        self._nested.calls = outer_nested + total
+        if keep_idle or own:
+            with self._lock:
+                self.latencies[action].append(elapsed)
+                self.api_calls[action] += own
+                if failure:
+                    self.errors[action] += 1
+                    self.failures[failure] += 1
+        return result, error
+
+
+def seed(tt, users):
+    tt.init_db()
+    tt.save_data("Users", tt.pd.DataFrame(
+        [{"id": 1, "name": "Administrator", "username": "admin", "password": tt.hash_password("admin"),
+          "role": "Admin", "date_added": str(tt.date.today())}]
+        + [{"id": i + 1, "name": f"Employee {i}", "username": f"user{i}", "password": tt.hash_password(f"pw{i}"),
+            "role": "Employee", "date_added": str(tt.date.today())} for i in range(1, users + 1)]
+    ))
+    tt.save_data("Clients", tt.pd.DataFrame([{"id": 1, "name": "Acme", "date_added": ""}, {"id": 2, "name": "Globex", "date_added": ""}]))
+    tt.save_data("Assets", tt.pd.DataFrame([{"id": 1, "name": "Banner", "date_added": ""}]))
+
+
+class Ledger:
+    # Per tab and user: the last acknowledged value, plus values attempted since then, which
+    # may or may not have landed.
+    def __init__(self):
+        self.acked = defaultdict(dict)
+        self.pending = defaultdict(lambda: defaultdict(set))
+
+    def attempt(self, tab, uid, value):
+        self.pending[tab][uid].add(value)
+
+    def ack(self, tab, uid, value):
+        self.acked[tab][uid] = value
+        self.pending[tab][uid] = set()
+
+
+def employee(tt, rec, index, rounds, week_start_str, ledger):
+    pd = tt.pd
+    for r in range(rounds):
+        user = rec.run("login", tt.authenticate, f"user{index}", f"pw{index}")
+        if user is None:
+            continue
+        uid = user['id']
+        ws = rec.run("open week", tt.build_working_set, uid, week_start_str)
+        if ws is None:
+            continue
+        # Each save is based on the versions the week had when it was opened, as in the app.
+        bases = ws['weeks'][week_start_str]['versions']
+
+        # Distinct values per user and round, so a stale write is detectable at the end.
+        hours = float(r + 1) + index / 1000
+        hours_df = pd.DataFrame([{"user_id": uid, "client_id": 1 + r % 2, "date": week_start_str, "hours": hours,
+                                  "week_start": week_start_str}])
+        ledger.attempt("TimeEntries", uid, hours)
+        if rec.run("edit hours", tt.save_slice, "TimeEntries", uid, week_start_str, hours_df,
+                   bases["TimeEntries"]) is not None:
+            ledger.ack("TimeEntries", uid, hours)
+
+        amount = r * 1000 + index
+        prod_df = pd.DataFrame([{"user_id": uid, "client_id": 1, "date": week_start_str, "asset_id": 1, "amount": amount,
+                                 "title": f"Pack {index}", "source_link": "", "ext_link": "", "time_spent": 1.0,
+                                 "creative_type_id": 0}])
+        ledger.attempt("ProductionEntries", uid, amount)
+        if rec.run("save assets", save_assets, tt, uid, week_start_str, prod_df, bases["ProductionEntries"]) is not None:
+            ledger.ack("ProductionEntries", uid, amount)
+
+        sub_df = pd.DataFrame([{"user_id": uid, "week_start": week_start_str, "status": "Submitted",
+                                "submitted_at": str(tt.datetime.datetime.now())}])
+        if rec.run("submit", tt.save_slice, "SubmittedWeeks", uid, week_start_str, sub_df, bases["SubmittedWeeks"]) is None:
+            continue
+        # Submitting reruns the page, which reopens the week.
+        ws = rec.run("open week", tt.build_working_set, uid, week_start_str)
+        if ws is None:
+            continue
+        sub_df['status'] = "Unlock Requested"
+        rec.run("request unlock", tt.save_slice, "SubmittedWeeks", uid, week_start_str, sub_df,
+                ws['weeks'][week_start_str]['versions']["SubmittedWeeks"])
+
+
+def save_assets(tt, uid, week_start_str, prod_df, base):
+    version = tt.save_slice("ProductionEntries", uid, week_start_str, prod_df, base)
+    tt.update_asset_library()
+    return version
+
+
+def admin(tt, rec, done):
+    empty = tt.pd.DataFrame(columns=tt.REQUIRED_TABS["SubmittedWeeks"])
+    while not done.is_set():
+        # A throttled read shows up as an "admin read" error; back off and poll again.
+        versions = tt.get_shared_store().scope_versions("SubmittedWeeks")
+        subs_df = rec.run("admin read", tt.load_data, "SubmittedWeeks")
+        if subs_df is None:
+            time.sleep(0.5)
+            continue
+        for _, row in subs_df[subs_df['status'] == "Unlock Requested"].iterrows():
+            base = versions.get(tt._slice_scope(row['user_id'], row['week_start']), 0)
+            rec.run("admin unlock", tt.save_slice, "SubmittedWeeks", row['user_id'], row['week_start'], empty, base)
+        time.sleep(0.05)
+
+
+def count_lost_updates(sheet, ledger):
+    lost = 0
+    for tab, column in (("TimeEntries", "hours"), ("ProductionEntries", "amount")):
+        rows = sheet.worksheets_by_title[tab].get_all_records()
+        stored = {int(r['user_id']): float(r[column]) for r in rows}
+        for uid, value in ledger.acked[tab].items():
+            if stored.get(uid) != float(value) and stored.get(uid) not in ledger.pending[tab][uid]:
+                lost += 1
+    return lost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=20, help="concurrent employee sessions")
+    parser.add_argument("--rounds", type=int, default=3, help="times each employee runs the flow")
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds added to every Sheets call")
+    parser.add_argument("--read-quota", type=int, default=60, help="read calls allowed per window (0 = unlimited)")
+    parser.add_argument("--write-quota", type=int, default=60, help="write calls allowed per window (0 = unlimited)")
+    parser.add_argument("--window", type=float, default=60.0, help="quota window in seconds")
+    parser.add_argument("--shared-cache", default=":memory:", help="SQLite path for the shared cache tier")
+    args = parser.parse_args()
+
+    os.environ["MYTRACKER_SHARED_CACHE"] = args.shared_cache
+    logging.disable(logging.WARNING)  # Streamlit warns about running outside `streamlit run`
+    import fake_sheets
+    import time_tracker as tt
+
+    # Seed without limits, then switch on latency and quotas for the run itself.
+    sheet = fake_sheets.reset()
+    seed(tt, args.users)
+    sheet.reset_usage()
+    sheet.limit(latency=args.latency, read_quota=args.read_quota or None,
+                write_quota=args.write_quota or None, window=args.window)
+
+    rec = Recorder(sheet)
+    flush_tab = tt._flush_tab
+    tt._flush_tab = lambda tab, version, wait=True: rec.flush(flush_tab, tab, version, wait)
+    versions_before = sum(tt.get_tab_version(tab) for tab in tt.REQUIRED_TABS)
+    week_start_str = str(tt.get_current_week_start())
+    ledger = Ledger()
+    done = threading.Event()
+
+    started = time.perf_counter()
+    admin_thread = threading.Thread(target=admin, args=(tt, rec, done))
+    admin_thread.start()
+    workers = [threading.Thread(target=employee, args=(tt, rec, i, args.rounds, week_start_str, ledger))
+               for i in range(1, args.users + 1)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    done.set()
+    admin_thread.join()
+    elapsed = time.perf_counter() - started
+    commits = sum(tt.get_tab_version(tab) for tab in tt.REQUIRED_TABS) - versions_before
+    flush_calls = rec.api_calls["flush"]
+
+    # Make sure the newest committed snapshot of each tab has reached the sheet before checking it.
+    sheet.limit()
+    for tab in ("TimeEntries", "ProductionEntries"):
+        flush_tab(tab, tt.get_tab_version(tab))
+
+    print(f"{args.users} users x {args.rounds} rounds in {elapsed:.1f}s "
+          f"(latency {args.latency:g}s, quotas {args.read_quota}/{args.write_quota} per {args.window:g}s)")
+    print(f"{'action':<16}{'count':>7}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'calls/action':>14}")
+    for action in ACTIONS:
+        values = rec.latencies.get(action, [])
+        if not values:
+            continue
+        print(f"{action:<16}{len(values):>7}{rec.errors[action]:>8}"
+              f"{percentile(values, 50) * 1000:>9.0f}{percentile(values, 95) * 1000:>9.0f}{percentile(values, 99) * 1000:>9.0f}"
+              f"{rec.api_calls[action] / len(values):>14.2f}")
+    print(f"flush calls per committed write: {flush_calls / max(commits, 1):.2f} ({flush_calls} calls, {commits} writes)")
+    print(f"failures: {dict(rec.failures)}")
+    print(f"throttled calls: {sheet.throttled['read']} read, {sheet.throttled['write']} write")
+    print(f"API calls: {dict(sheet.calls)}")
+    print(f"lost updates: {count_lost_updates(sheet, ledger)}")
+
+
+if __name__ == "__main__":
+    main()
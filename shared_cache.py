@@ -0,0 +1,287 @@
+"""Cross-process cache tier for MyTracker's Google Sheets tabs.
+
+Each Streamlit process keeps its own ``st.cache_data``. This store sits behind
+it so replicas share tab snapshots and version numbers: a write on any replica
+bumps the tab's version (which changes the local cache key everywhere), and a
+short lease makes sure only one replica refreshes a tab from Sheets at a time.
+
+A tab's snapshot is stored as slices (e.g. one user's week of time entries),
+each keyed by a function the caller supplies. ``update`` rewrites a single
+slice, so its cost does not grow with the size of the tab, and it only
+conflicts with writes to that same slice: every slice carries its own version,
+and a write made on top of an older one is refused. The committed snapshot is
+the source of truth until it has been flushed to Sheets (tracked separately so
+flushes can trail commits).
+
+The store is a plain SQLite file, so pointing every replica on a host at the
+same path is all the setup it needs. ``":memory:"`` keeps it process-local,
+which also means writes that have not reached Sheets yet do not survive a
+restart (see ``durable``).
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tabs (
+    tab TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    snapshot_version INTEGER,
+    fetched_at REAL
+);
+CREATE TABLE IF NOT EXISTS slices (
+    tab TEXT NOT NULL,
+    key TEXT NOT NULL,
+    records TEXT NOT NULL,
+    PRIMARY KEY (tab, key)
+);
+CREATE TABLE IF NOT EXISTS flushes (
+    tab TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS scopes (
+    tab TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (tab, scope)
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    token TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SnapshotMissing(Exception):
+    """The tab's current version has no usable snapshot; load it from Sheets and try again."""
+
+
+class SharedTabStore:
+    def __init__(self, path=":memory:", lease_seconds=30):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        # Only a file outlives the process; an in-memory store loses anything not yet flushed to Sheets.
+        self.durable = path not in (":memory:", "")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        if self.durable:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    # --- VERSIONS & SNAPSHOTS ---
+
+    def version(self, tab):
+        row = self._execute("SELECT version FROM tabs WHERE tab = ?", (tab,))
+        return row[0] if row else 0
+
+    def latest(self, tab, max_age=None):
+        """Return ``(version, records)`` for the tab's current version, read together.
+
+        ``records`` is None if that version has no snapshot yet, or if it has reached
+        Sheets and was fetched more than ``max_age`` seconds ago. Until it has been
+        flushed, the snapshot is the only up-to-date copy and is always returned.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                row = self._conn.execute(
+                    "SELECT tabs.version, snapshot_version, fetched_at, COALESCE(f.version, 0) FROM tabs "
+                    "LEFT JOIN flushes f USING (tab) WHERE tab = ?",
+                    (tab,),
+                ).fetchone()
+                slices = []
+                if row and row[1] == row[0]:
+                    slices = self._conn.execute(
+                        "SELECT records FROM slices WHERE tab = ? ORDER BY rowid", (tab,)
+                    ).fetchall()
+            finally:
+                self._conn.execute("COMMIT")
+        if not row:
+            return 0, None
+        if row[1] != row[0] or (max_age is not None and row[3] >= row[0] and time.time() - row[2] > max_age):
+            return row[0], None
+        return row[0], [r for (payload,) in slices for r in json.loads(payload)]
+
+    def publish(self, tab, version, records, key):
+        """Store records read from Sheets, unless a write has moved the tab past ``version``."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("INSERT OR IGNORE INTO tabs (tab) VALUES (?)", (tab,))
+                current, snapshot_version = self._conn.execute(
+                    "SELECT version, snapshot_version FROM tabs WHERE tab = ?", (tab,)
+                ).fetchone()
+                if current == version:
+                    # The first load only fills in what was there all along; a later one picks up edits
+                    # made directly in the sheet, which count as writes to the slices they changed.
+                    self._store_slices(tab, records, key, bump=snapshot_version is not None)
+                    self._conn.execute(
+                        "UPDATE tabs SET snapshot_version = ?, fetched_at = ? WHERE tab = ?",
+                        (version, time.time(), tab),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def scope_version(self, tab, scope):
+        """Version of one slice of a tab (or any other named scope); bumped only by writes that touch it."""
+        row = self._execute("SELECT version FROM scopes WHERE tab = ? AND scope = ?", (tab, str(scope)))
+        return row[0] if row else 0
+
+    def scope_versions(self, tab, scopes=None):
+        """Versions of several scopes of a tab (all of them if ``scopes`` is None) in one read."""
+        with self._lock:
+            if scopes is None:
+                rows = self._conn.execute("SELECT scope, version FROM scopes WHERE tab = ?", (tab,)).fetchall()
+            else:
+                scopes = [str(s) for s in scopes]
+                rows = self._conn.execute(
+                    f"SELECT scope, version FROM scopes WHERE tab = ? AND scope IN ({','.join('?' * len(scopes))})",
+                    (tab, *scopes),
+                ).fetchall()
+        versions = dict(rows)
+        return versions if scopes is None else {s: versions.get(s, 0) for s in scopes}
+
+    def update(self, tab, key, fn, base=None, scopes=(), max_age=None):
+        """Replace the slice ``key`` with ``fn(records in that slice)`` and return the new tab version.
+
+        With ``base``, the write is refused (None is returned) if the slice has been
+        written since the caller read it at that version. Only this slice is read and
+        written, and writes to other slices never conflict. The slice's version and every
+        scope in ``scopes`` are bumped. Raises SnapshotMissing if the current version has
+        no snapshot to apply ``fn`` to (see ``latest``).
+        """
+        key = str(key)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT tabs.version, snapshot_version, fetched_at, COALESCE(f.version, 0) FROM tabs "
+                    "LEFT JOIN flushes f USING (tab) WHERE tab = ?",
+                    (tab,),
+                ).fetchone()
+                if not row or row[1] != row[0] or (
+                    max_age is not None and row[3] >= row[0] and time.time() - row[2] > max_age
+                ):
+                    raise SnapshotMissing(tab)
+                if base is not None:
+                    current = self._conn.execute(
+                        "SELECT version FROM scopes WHERE tab = ? AND scope = ?", (tab, key)
+                    ).fetchone()
+                    if (current[0] if current else 0) != base:
+                        self._conn.execute("ROLLBACK")
+                        return None
+                existing = self._conn.execute("SELECT records FROM slices WHERE tab = ? AND key = ?", (tab, key)).fetchone()
+                self._put_slice(tab, key, fn(json.loads(existing[0]) if existing else []))
+                for scope in (key, *scopes):
+                    self._bump(tab, scope)
+                self._conn.execute(
+                    "UPDATE tabs SET version = ?, snapshot_version = ?, fetched_at = ? WHERE tab = ?",
+                    (row[0] + 1, row[0] + 1, time.time(), tab),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row[0] + 1
+
+    def replace(self, tab, records, key):
+        """Publish a write of the whole tab unconditionally and return the new version."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("INSERT OR IGNORE INTO tabs (tab) VALUES (?)", (tab,))
+                current = self._conn.execute("SELECT version FROM tabs WHERE tab = ?", (tab,)).fetchone()[0]
+                self._store_slices(tab, records, key)
+                self._conn.execute(
+                    "UPDATE tabs SET version = ?, snapshot_version = ?, fetched_at = ? WHERE tab = ?",
+                    (current + 1, current + 1, time.time(), tab),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return current + 1
+
+    def _store_slices(self, tab, records, key, bump=True):
+        # Rewrites the tab's slices from a full list of records; slices whose contents changed get their
+        # version bumped, so a write based on what they held before is refused.
+        grouped = defaultdict(list)
+        for r in records:
+            grouped[str(key(r))].append(r)
+        old = dict(self._conn.execute("SELECT key, records FROM slices WHERE tab = ?", (tab,)).fetchall())
+        for k in old.keys() - grouped.keys():
+            self._conn.execute("DELETE FROM slices WHERE tab = ? AND key = ?", (tab, k))
+            if bump:
+                self._bump(tab, k)
+        for k, rows in grouped.items():
+            payload = json.dumps(rows, default=str)
+            if old.get(k) != payload:
+                self._put_slice(tab, k, rows, payload)
+                if bump:
+                    self._bump(tab, k)
+
+    def _put_slice(self, tab, key, records, payload=None):
+        if not records:
+            self._conn.execute("DELETE FROM slices WHERE tab = ? AND key = ?", (tab, key))
+            return
+        # An upsert keeps the slice's place in the tab, so rows don't move around in the sheet.
+        self._conn.execute(
+            "INSERT INTO slices (tab, key, records) VALUES (?, ?, ?) "
+            "ON CONFLICT(tab, key) DO UPDATE SET records = excluded.records",
+            (tab, key, payload or json.dumps(records, default=str)),
+        )
+
+    def _bump(self, tab, scope):
+        self._conn.execute(
+            "INSERT INTO scopes (tab, scope, version) VALUES (?, ?, 1) "
+            "ON CONFLICT(tab, scope) DO UPDATE SET version = version + 1",
+            (tab, str(scope)),
+        )
+
+    def flushed_version(self, tab):
+        row = self._execute("SELECT version FROM flushes WHERE tab = ?", (tab,))
+        return row[0] if row else 0
+
+    def unflushed_tabs(self):
+        """Tabs with committed versions that have not reached Sheets yet."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT tab FROM tabs LEFT JOIN flushes f USING (tab) WHERE tabs.version > COALESCE(f.version, 0)"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def mark_flushed(self, tab, version):
+        self._execute(
+            "INSERT INTO flushes (tab, version) VALUES (?, ?) "
+            "ON CONFLICT(tab) DO UPDATE SET version = MAX(version, excluded.version)",
+            (tab, version),
+        )
+
+    # --- LEASES ---
+
+    def acquire(self, name):
+        """Try to take the named lease. Returns a token for ``release`` or None if it is held."""
+        token = uuid.uuid4().hex
+        now = time.time()
+        self._execute(
+            "INSERT INTO leases (name, token, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET token = excluded.token, expires_at = excluded.expires_at "
+            "WHERE leases.expires_at < ?",
+            (name, token, now + self.lease_seconds, now),
+        )
+        row = self._execute("SELECT token FROM leases WHERE name = ?", (name,))
+        return token if row and row[0] == token else None
+
+    def release(self, name, token):
+        self._execute("DELETE FROM leases WHERE name = ? AND token = ?", (name, token))
@@ -0,0 +1,116 @@
+import threading
+
+import pandas as pd
+import pytest
+
+import fake_sheets
+import time_tracker as tt
+
+WEEKS = ["2026-10-05", "2026-10-12"]
+
+
+@pytest.fixture
+def sheet():
+    sheet = fake_sheets.reset()
+    tt.get_shared_store.clear()
+    tt._load_tab.clear()
+    tt.init_db()
+    sheet.limit(latency=0.01)
+    return sheet
+
+
+def hours_row(user_id, week, hours):
+    return pd.DataFrame([{"user_id": user_id, "client_id": 1, "date": week, "hours": hours, "week_start": week}])
+
+
+def run_together(targets):
+    barrier = threading.Barrier(len(targets))
+    results = [None] * len(targets)
+
+    def run(i, fn):
+        barrier.wait()
+        results[i] = fn()
+
+    threads = [threading.Thread(target=run, args=(i, fn)) for i, fn in enumerate(targets)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def sheet_hours(sheet):
+    tt._flush_tab("TimeEntries", tt.get_tab_version("TimeEntries"))
+    rows = sheet.worksheets_by_title["TimeEntries"].get_all_records()
+    return sorted((int(r["user_id"]), r["week_start"], float(r["hours"])) for r in rows)
+
+
+def slice_version(user_id, week):
+    return tt.get_shared_store().scope_version("TimeEntries", tt._slice_scope(user_id, week))
+
+
+def test_saves_to_different_slices_all_land(sheet):
+    slices = [(uid, week) for uid in range(1, 11) for week in WEEKS]
+    results = run_together([
+        lambda uid=uid, week=week: tt.save_slice("TimeEntries", uid, week, hours_row(uid, week, uid + 0.5), 0)
+        for uid, week in slices
+    ])
+
+    assert None not in results
+    assert sorted(results) == list(range(1, len(slices) + 1))
+    assert sheet_hours(sheet) == sorted((uid, week, uid + 0.5) for uid, week in slices)
+
+
+def test_stale_save_of_same_week_is_refused(sheet):
+    tt.save_slice("TimeEntries", 1, WEEKS[0], hours_row(1, WEEKS[0], 1.0), 0)
+    seen = slice_version(1, WEEKS[0])  # two browser tabs both open the week here
+
+    assert tt.save_slice("TimeEntries", 1, WEEKS[0], hours_row(1, WEEKS[0], 2.0), seen) is not None
+    # A save elsewhere in the tab doesn't count against the second tab...
+    assert tt.save_slice("TimeEntries", 2, WEEKS[0], hours_row(2, WEEKS[0], 5.0), 0) is not None
+    # ...but its save of the same week is based on what the first tab has since replaced.
+    assert tt.save_slice("TimeEntries", 1, WEEKS[0], hours_row(1, WEEKS[0], 3.0), seen) is None
+    assert sheet_hours(sheet) == [(1, WEEKS[0], 2.0), (2, WEEKS[0], 5.0)]
+
+    # Once it has reloaded the week, the second tab can save over it.
+    assert tt.save_slice("TimeEntries", 1, WEEKS[0], hours_row(1, WEEKS[0], 3.0), slice_version(1, WEEKS[0])) is not None
+    assert sheet_hours(sheet) == [(1, WEEKS[0], 3.0), (2, WEEKS[0], 5.0)]
+
+
+def test_racing_saves_of_same_week_keep_exactly_one(sheet):
+    base = slice_version(1, WEEKS[0])
+    results = run_together([
+        lambda hours=hours: tt.save_slice("TimeEntries", 1, WEEKS[0], hours_row(1, WEEKS[0], hours), base)
+        for hours in (3.0, 4.0)
+    ])
+
+    assert results.count(None) == 1
+    winner = 3.0 if results[0] is not None else 4.0
+    assert sheet_hours(sheet) == [(1, WEEKS[0], winner)]
+
+
+def test_throttled_flush_leaves_sheet_intact(sheet):
+    tt.save_slice("TimeEntries", 1, WEEKS[0], hours_row(1, WEEKS[0], 1.0), 0)
+    before = [list(r) for r in sheet.worksheets_by_title["TimeEntries"].rows]
+
+    sheet.limit(write_quota=0)
+    # Without a store file the save would only live in memory, so it fails instead of being queued.
+    with pytest.raises(fake_sheets.QuotaExceeded):
+        tt.save_slice("TimeEntries", 2, WEEKS[0], hours_row(2, WEEKS[0], 2.0), 0)
+    assert sheet.worksheets_by_title["TimeEntries"].rows == before
+
+
+def test_throttled_flush_is_queued_with_store_file(sheet, tmp_path, monkeypatch):
+    monkeypatch.setattr(tt, "SHARED_CACHE_PATH", str(tmp_path / "cache.db"))
+    tt.get_shared_store.clear()
+    tt._load_tab.clear()
+
+    sheet.limit(write_quota=0)
+    assert tt.save_slice("TimeEntries", 2, WEEKS[0], hours_row(2, WEEKS[0], 2.0), 0) is not None
+    assert sheet.worksheets_by_title["TimeEntries"].rows == [tt.REQUIRED_TABS["TimeEntries"]]
+
+    sheet.limit()
+    tt.flush_pending_tabs()
+    assert sheet.worksheets_by_title["TimeEntries"].get_all_records() == [
+        {"user_id": 2, "client_id": 1, "date": WEEKS[0], "hours": 2.0, "week_start": WEEKS[0]}
+    ]
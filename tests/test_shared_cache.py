@@ -0,0 +1,60 @@
+import time
+
+from shared_cache import SharedTabStore
+
+KEY = lambda r: str(r["user_id"])
+
+
+def test_publish_is_refused_once_a_write_moved_the_tab_on():
+    store = SharedTabStore()
+    version, _ = store.latest("T")
+    store.replace("T", [{"user_id": 1, "hours": 8}], KEY)
+
+    # A Sheets read that started before the write must not replace what it wrote.
+    store.publish("T", version, [{"user_id": 1, "hours": 4}], KEY)
+    assert store.latest("T") == (1, [{"user_id": 1, "hours": 8}])
+
+
+def test_lease_is_exclusive_until_released_or_expired():
+    store = SharedTabStore(lease_seconds=0.2)
+    token = store.acquire("flush:T")
+    assert token is not None
+    assert store.acquire("flush:T") is None
+
+    store.release("flush:T", token)
+    token = store.acquire("flush:T")
+    assert token is not None
+
+    time.sleep(0.3)
+    newer = store.acquire("flush:T")
+    assert newer is not None
+    # The expired holder releasing late must not free the lease it lost.
+    store.release("flush:T", token)
+    assert store.acquire("flush:T") is None
+
+
+def test_max_age_only_applies_once_flushed():
+    store = SharedTabStore()
+    version = store.replace("T", [{"user_id": 1, "hours": 8}], KEY)
+    time.sleep(0.05)
+
+    # Not in Sheets yet, so the snapshot is the only copy and never expires.
+    assert store.latest("T", max_age=0.01) == (version, [{"user_id": 1, "hours": 8}])
+    store.mark_flushed("T", version)
+    assert store.latest("T", max_age=0.01) == (version, None)
+    assert store.latest("T") == (version, [{"user_id": 1, "hours": 8}])
+
+
+def test_stores_on_one_file_share_versions_and_slices(tmp_path):
+    path = str(tmp_path / "cache.db")
+    a, b = SharedTabStore(path), SharedTabStore(path)
+    a.replace("T", [{"user_id": 1, "hours": 8}, {"user_id": 2, "hours": 6}], KEY)
+    assert b.version("T") == 1
+    assert b.latest("T") == (1, [{"user_id": 1, "hours": 8}, {"user_id": 2, "hours": 6}])
+
+    seen = a.scope_version("T", "1")
+    assert b.update("T", "1", lambda rows: [{"user_id": 1, "hours": 9}], base=b.scope_version("T", "1")) == 2
+    # A write to another slice goes through; one based on the old version of slice 1 does not.
+    assert a.update("T", "2", lambda rows: [{"user_id": 2, "hours": 7}], base=a.scope_version("T", "2")) == 3
+    assert a.update("T", "1", lambda rows: [{"user_id": 1, "hours": 1}], base=seen) is None
+    assert a.latest("T") == b.latest("T") == (3, [{"user_id": 1, "hours": 9}, {"user_id": 2, "hours": 7}])
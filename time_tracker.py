@@ -1,13 +1,21 @@
 import streamlit as st
 import pandas as pd
 import gspread
+from gspread.utils import rowcol_to_a1
 from oauth2client.service_account import ServiceAccountCredentials
 import datetime
 from datetime import date, timedelta
 import calendar
+import hashlib
+import hmac
 import json
+import os
+import random
+import secrets
 import time
 
+from shared_cache import SharedTabStore, SnapshotMissing
+
 # --- CONFIGURATION ---
 st.set_page_config(page_title="MyTracker", layout="wide")
 
@@ -16,7 +24,7 @@ SHEET_URL = "https://docs.google.com/spreadsheets/d/1zwALYqjWu9rw80e99IcIjwbxRB_
 
 # --- GLOBAL SCHEMA DEFINITION ---
 REQUIRED_TABS = {
-    "Users": ["id", "name", "username", "password", "role", "date_added"],
+    "Users": ["id", "name", "username", "password", "role", "date_added", "session_nonce"],
     "Clients": ["id", "name", "date_added"],
     "Assets": ["id", "name", "date_added"],
     "CreativeTypes": ["id", "name", "date_added"],
@@ -28,9 +36,31 @@ REQUIRED_TABS = {
     "AssetLibrary": ["Title", "Employee", "Client", "Date", "Asset Category", "Creative Type", "Source Link", "External Link"]
 }
 
+# --- CACHE SETTINGS ---
+CACHE_TTL = 600
+# Every save creates a new tab version, so cap the local cache rather than keep one copy per save
+# for CACHE_TTL. The cap is shared by all tabs (room for about three versions each), so a burst of
+# saves to one tab can evict another tab's entry; that entry is then rebuilt from the shared
+# store's snapshot, not read from Sheets again.
+CACHE_MAX_ENTRIES = 3 * len(REQUIRED_TABS)
+# Point every replica at the same file to share tab snapshots across processes.
+SHARED_CACHE_PATH = os.environ.get("MYTRACKER_SHARED_CACHE", ":memory:")
+# How long a replica waits for another one's Sheets refresh before fetching itself.
+REFRESH_WAIT = 10
+
+# --- AUTH SETTINGS ---
+PASSWORD_ITERATIONS = 260000
+# Session links are bearer credentials in the URL, so keep them short-lived.
+SESSION_TTL = 12 * 3600
+# How many times a save tries to load the tab from Sheets before giving up.
+SAVE_RETRIES = 8
+
 # --- GOOGLE SHEETS CONNECTION ---
 
 def get_sheet_client():
+    if os.environ.get("MYTRACKER_BACKEND") == "fake":
+        import fake_sheets
+        return fake_sheets.get_client()
     scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
     try:
         creds = ServiceAccountCredentials.from_json_keyfile_name('service_account.json', scope)
@@ -54,52 +84,228 @@ def init_db():
                 ws = sh.add_worksheet(title=tab_name, rows=100, cols=20)
                 ws.append_row(headers)
                 if tab_name == "Users":
-                    ws.append_row([1, "Administrator", "admin", "admin", "Admin", str(date.today())])
+                    ws.append_row([1, "Administrator", "admin", hash_password("admin"), "Admin", str(date.today()), secrets.token_hex(16)])
     except Exception as e:
         st.error(f"Database Init Error: {e}")
 
-# --- DATA FUNCTIONS ---
+# --- SHARED CACHE TIER ---
 
-@st.cache_data(ttl=600)
-def load_data(tab_name):
+@st.cache_resource
+def get_shared_store():
+    return SharedTabStore(SHARED_CACHE_PATH)
+
+def get_tab_version(tab_name):
+    return get_shared_store().version(tab_name)
+
+def _fetch_records(tab_name):
     client = get_sheet_client()
+    sh = client.open_by_url(SHEET_URL)
+    return sh.worksheet(tab_name).get_all_records()
+
+def _refresh_tab(store, tab_name):
+    # Only one replica refreshes a tab from Sheets at a time; the others wait for its snapshot.
+    lease = f"refresh:{tab_name}"
+    deadline = time.time() + REFRESH_WAIT
+    token = store.acquire(lease)
+    while token is None:
+        time.sleep(0.2)
+        version, records = store.latest(tab_name, max_age=CACHE_TTL)
+        if records is not None:
+            return records
+        if time.time() > deadline:
+            return _fetch_records(tab_name)
+        token = store.acquire(lease)
+
     try:
-        sh = client.open_by_url(SHEET_URL)
-        worksheet = sh.worksheet(tab_name)
-        data = worksheet.get_all_records()
-        
-        expected_cols = REQUIRED_TABS.get(tab_name, [])
-        if not data:
-            return pd.DataFrame(columns=expected_cols)
-            
-        df = pd.DataFrame(data)
+        version, records = store.latest(tab_name, max_age=CACHE_TTL)
+        if records is None:
+            records = _fetch_records(tab_name)
+            store.publish(tab_name, version, records, _slice_key(tab_name))
+        return records
+    finally:
+        store.release(lease, token)
+
+# --- DATA FUNCTIONS ---
+
+NUMERIC_COLS = ['id', 'user_id', 'client_id', 'asset_id', 'hours', 'amount', 'time_spent', 'creative_type_id']
+
+def _frame_from_records(tab_name, data):
+    expected_cols = REQUIRED_TABS.get(tab_name, [])
+    if not data:
+        return pd.DataFrame(columns=expected_cols)
         
-        for col in expected_cols:
-            if col not in df.columns:
-                df[col] = None
-
-        # Convert numeric columns safely
-        numeric_cols = ['id', 'user_id', 'client_id', 'asset_id', 'hours', 'amount', 'time_spent', 'creative_type_id']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-        return df
+    df = pd.DataFrame(data)
+    
+    for col in expected_cols:
+        if col not in df.columns:
+            df[col] = None
+
+    # Convert numeric columns safely
+    for col in NUMERIC_COLS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    return df
+
+def load_data(tab_name):
+    # The tab version is part of the cache key, so a write on any replica invalidates it everywhere.
+    return _load_tab(tab_name, get_tab_version(tab_name))
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES)
+def _load_tab(tab_name, version):
+    # A write may have landed since `version` was read. Its snapshot is newer, never staler, so use
+    # it rather than reading Sheets, which may not have been flushed up to `version` yet.
+    store = get_shared_store()
+    try:
+        _, records = store.latest(tab_name, max_age=CACHE_TTL)
+        if records is None:
+            records = _refresh_tab(store, tab_name)
+        return _frame_from_records(tab_name, records)
     except Exception as e:
         # 🔴 THE FIX: If the connection fails, stop the app completely to protect the database!
         st.error("⚠️ Connection to Google Sheets was interrupted by Google. Please refresh the page to try again.")
         st.stop()
+        raise  # only reached outside `streamlit run` (e.g. loadtest.py), where st.stop() is a no-op
 
-def save_data(tab_name, df):
-    client = get_sheet_client()
-    sh = client.open_by_url(SHEET_URL)
-    worksheet = sh.worksheet(tab_name)
-    worksheet.clear()
-    
+def _sheet_rows(tab_name, df):
     expected_cols = REQUIRED_TABS.get(tab_name, [])
     valid_cols = [c for c in expected_cols if c in df.columns]
-    
-    worksheet.update([df[valid_cols].columns.values.tolist()] + df[valid_cols].values.tolist())
-    load_data.clear()
+    values = df[valid_cols].astype(object).where(df[valid_cols].notna(), "")
+    return valid_cols, values.values.tolist()
+
+def _flush_tab(tab_name, version, wait=True):
+    # Sheets is written in version order by whoever holds the tab's flush lease, always with the newest
+    # snapshot, so a burst of saves turns into a few full-tab writes and an older one never lands last.
+    store = get_shared_store()
+    lease = f"flush:{tab_name}"
+    deadline = time.time() + (store.lease_seconds if wait else 0)
+    while store.flushed_version(tab_name) < version:
+        token = store.acquire(lease)
+        if token is None:
+            if time.time() > deadline:
+                return  # the lease holder is still flushing and will pick this version up
+            time.sleep(0.1)
+            continue
+        try:
+            latest, records = store.latest(tab_name)
+            if records is not None and store.flushed_version(tab_name) < latest:
+                header = REQUIRED_TABS.get(tab_name) or list(records[0] if records else [])
+                values = [header] + [[r.get(c, "") for c in header] for r in records]
+                client = get_sheet_client()
+                sh = client.open_by_url(SHEET_URL)
+                worksheet = sh.worksheet(tab_name)
+                # Overwrite in place, then clear whatever is left below: if either call fails, the sheet
+                # still holds every row it had before (at worst with some stale ones at the bottom).
+                worksheet.update(values, range_name="A1")
+                if worksheet.row_count > len(values):
+                    last_cell = rowcol_to_a1(worksheet.row_count, max(worksheet.col_count, len(header)))
+                    worksheet.batch_clear([f"A{len(values) + 1}:{last_cell}"])
+                store.mark_flushed(tab_name, latest)
+        finally:
+            store.release(lease, token)
+
+def _flush_or_queue(tab_name, version):
+    # The write is already committed to the shared store. If that is a file, it survives a restart, so
+    # when Sheets refuses the write (e.g. over quota) flush_pending_tabs() retries later, as does any
+    # newer save of the tab. An in-memory store would lose it on restart, so there the save fails.
+    try:
+        _flush_tab(tab_name, version)
+    except Exception:
+        if not get_shared_store().durable:
+            st.error("⚠️ Google Sheets did not accept the save. Please try again.")
+            st.stop()
+            raise
+        st.warning("⚠️ Saved, but Google Sheets is busy right now. Your changes will be written to the sheet shortly.")
+
+def flush_pending_tabs():
+    # At most one retry pass per lease period across all replicas, so a throttled sheet isn't hammered.
+    store = get_shared_store()
+    if store.acquire("flush-retry") is None:
+        return
+    for tab_name in store.unflushed_tabs():
+        try:
+            _flush_tab(tab_name, store.version(tab_name), wait=False)
+        except Exception:
+            return
+
+def save_data(tab_name, df):
+    # Publish what we are writing first, so no replica has to read it back from Sheets.
+    header, rows = _sheet_rows(tab_name, df)
+    version = get_shared_store().replace(tab_name, [dict(zip(header, r)) for r in rows], _slice_key(tab_name))
+    _flush_or_queue(tab_name, version)
+
+def _as_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+def _week_start_of(value):
+    try:
+        day = date.fromisoformat(str(value))
+    except ValueError:
+        return str(value)
+    return str(day - timedelta(days=day.weekday()))
+
+def _slice_key(tab_name):
+    # How the shared store splits a tab into slices: one user's week for the timesheet tabs, one row
+    # for Users, and a single slice for the small lookup tabs that are only ever saved whole.
+    if tab_name in ("TimeEntries", "SubmittedWeeks"):
+        return lambda r: f"{_as_int(r.get('user_id'))}:{r.get('week_start')}"
+    if tab_name == "ProductionEntries":
+        return lambda r: f"{_as_int(r.get('user_id'))}:{_week_start_of(r.get('date'))}"
+    if tab_name == "Users":
+        return lambda r: str(_as_int(r.get('id')))
+    return lambda r: ""
+
+def _slice_scope(user_id, week_start_str):
+    return f"{_user_scope(user_id)}:{week_start_str}"
+
+def _update_tab(tab_name, key, fn, base=None, scopes=()):
+    # Applies fn to one slice of the tab in the shared store and flushes the result. Returns the new tab
+    # version, or None if `base` is given and the slice has been saved since that version.
+    store = get_shared_store()
+    error = SnapshotMissing(tab_name)
+    for attempt in range(SAVE_RETRIES):
+        try:
+            new_version = store.update(tab_name, key, fn, base=base, scopes=scopes, max_age=CACHE_TTL)
+        except SnapshotMissing:
+            # Nothing to apply it to yet: load the tab from Sheets (which publishes it), then try again.
+            try:
+                _refresh_tab(store, tab_name)
+            except Exception as e:
+                error = e
+                time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+            continue
+        if new_version is not None:
+            _flush_or_queue(tab_name, new_version)
+        return new_version
+
+    st.error("⚠️ Connection to Google Sheets was interrupted by Google. Please refresh the page to try again.")
+    st.stop()
+    raise error
+
+def save_slice(tab_name, user_id, week_start_str, new_rows, base_version=None):
+    # Replaces one user's rows for one week. `base_version` is the version of that week the rows were
+    # edited from (see shown_slice_version); if it has been saved since, e.g. from another browser tab,
+    # nothing is written and None is returned. Saves to other weeks or users never conflict.
+    header, rows = _sheet_rows(tab_name, new_rows)
+    new_records = [dict(zip(header, r)) for r in rows]
+    new_version = _update_tab(tab_name, _slice_scope(user_id, week_start_str), lambda records: new_records,
+                              base=base_version, scopes=(_user_scope(user_id),))
+    if new_version is None:
+        st.error("⚠️ This week was saved from somewhere else (another tab or device) while you were editing, "
+                 "so your changes were not saved. It now shows the latest version; check it and save again.")
+    return new_version
+
+def update_user_row(user_id, updates, expected=None):
+    # Changes fields of one Users row without rewriting anyone else's. With `expected`, the row is
+    # left alone unless those fields still hold the given values (e.g. a password reset got in first).
+    def apply(records):
+        for r in records:
+            if all(str(r.get(k)) == str(v) for k, v in (expected or {}).items()):
+                r.update(updates)
+        return records
+    return _update_tab("Users", _user_scope(user_id), apply)
 
 def generate_id(df):
     if df.empty or 'id' not in df.columns: return 1
@@ -161,6 +367,184 @@ def get_current_week_start():
 def get_week_dates(start_date):
     return [start_date + timedelta(days=i) for i in range(7)]
 
+# --- WORKING SET ---
+
+# Tabs that make up a user's week, and how many weeks either side of the selected one are kept in memory.
+WORKING_SET_TABS = ["SubmittedWeeks", "TimeEntries", "ProductionEntries"]
+WORKING_SET_RADIUS = 2
+
+def _user_scope(user_id):
+    return str(int(user_id))
+
+def _working_set_versions(user_id):
+    store = get_shared_store()
+    return tuple(store.scope_version(tab, _user_scope(user_id)) for tab in WORKING_SET_TABS)
+
+def _week_versions(user_id, week_start_str):
+    store = get_shared_store()
+    return {tab: store.scope_version(tab, _slice_scope(user_id, week_start_str)) for tab in WORKING_SET_TABS}
+
+def build_working_set(user_id, center_week):
+    # Read the versions first, so a save that lands while we slice makes the result look stale, not fresh.
+    versions = _working_set_versions(user_id)
+    center = date.fromisoformat(center_week)
+    weeks = [str(center + timedelta(weeks=k)) for k in range(-WORKING_SET_RADIUS, WORKING_SET_RADIUS + 1)]
+    store = get_shared_store()
+    slice_versions = {tab: store.scope_versions(tab, [_slice_scope(user_id, w) for w in weeks]) for tab in WORKING_SET_TABS}
+
+    subs_df = load_data("SubmittedWeeks")
+    time_df = load_data("TimeEntries")
+    prod_df = load_data("ProductionEntries")
+
+    user_subs = subs_df[(subs_df['user_id'] == user_id) & subs_df['week_start'].isin(weeks)]
+    statuses = dict(zip(user_subs['week_start'], user_subs['status']))
+
+    user_time = time_df[(time_df['user_id'] == user_id) & time_df['week_start'].isin(weeks)]
+    time_by_week = dict(tuple(user_time.groupby('week_start')))
+
+    user_prod = prod_df[prod_df['user_id'] == user_id]
+    prod_dates = pd.to_datetime(user_prod['date'], errors='coerce')
+    prod_weeks = (prod_dates - pd.to_timedelta(prod_dates.dt.weekday, unit='D')).dt.strftime('%Y-%m-%d')
+    prod_by_week = dict(tuple(user_prod.groupby(prod_weeks)))
+
+    return {
+        "user_id": user_id,
+        "versions": versions,
+        "built_at": time.time(),
+        "weeks": {
+            w: {
+                "lock_status": statuses.get(w),
+                "time": time_by_week.get(w, time_df.iloc[0:0]),
+                "prod": prod_by_week.get(w, prod_df.iloc[0:0]),
+                # What each tab's slice of this week looked like, for save_slice's conflict check.
+                "versions": {tab: slice_versions[tab][_slice_scope(user_id, w)] for tab in WORKING_SET_TABS},
+            }
+            for w in weeks
+        },
+    }
+
+def get_week_slice(user_id, week_start_str):
+    # Week navigation is served from this session's working set until one of the user's own saves
+    # (or an admin unlocking one of their weeks) bumps the user's version of those tabs via save_slice.
+    ws = st.session_state.get('working_set')
+    stale = (
+        ws is None
+        or ws['user_id'] != user_id
+        or time.time() - ws['built_at'] > CACHE_TTL
+        or ws['versions'] != _working_set_versions(user_id)
+        # Edits made directly in the sheet reach a week's slices without touching the user's versions.
+        or (week_start_str in ws['weeks'] and ws['weeks'][week_start_str]['versions'] != _week_versions(user_id, week_start_str))
+    )
+    center = date.fromisoformat(week_start_str)
+    neighbours = [str(center + timedelta(weeks=k)) for k in (-1, 0, 1)]
+    # Recentre the window whenever a neighbouring week is missing, so the next step is already in memory.
+    if stale or any(w not in ws['weeks'] for w in neighbours):
+        ws = build_working_set(user_id, week_start_str)
+        st.session_state['working_set'] = ws
+    return ws['weeks'][week_start_str]
+
+def shown_slice_version(widget_key, version):
+    # The slice version a widget showed on the previous run, i.e. what the user was looking at when they
+    # edited it and clicked save; remembers the version shown now for the next click.
+    shown = st.session_state.get(widget_key, version)
+    st.session_state[widget_key] = version
+    return shown
+
+# --- AUTH ---
+
+def hash_password(password):
+    salt = secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), PASSWORD_ITERATIONS).hex()
+    return f"pbkdf2_sha256${PASSWORD_ITERATIONS}${salt}${digest}"
+
+def is_password_hash(stored):
+    return isinstance(stored, str) and stored.startswith("pbkdf2_sha256$")
+
+def verify_password(password, stored):
+    if not is_password_hash(stored):
+        # Rows from before hashing still hold the plain password; they are upgraded on login.
+        return hmac.compare_digest(str(stored).encode(), password.encode())
+    _, iterations, salt, digest = stored.split("$")
+    candidate = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), int(iterations)).hex()
+    return hmac.compare_digest(candidate, digest)
+
+# Checked against unknown usernames so a miss takes as long as a wrong password.
+_DUMMY_HASH = f"pbkdf2_sha256${PASSWORD_ITERATIONS}${'0' * 32}${'0' * 64}"
+
+def _session_user(record):
+    return {k: v for k, v in record.items() if k not in ('password', 'session_nonce')}
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES)
+def _auth_index(version):
+    users_df = _load_tab("Users", version)
+    records = users_df.to_dict('records')
+    return {
+        "by_username": {str(r['username']): r for r in records},
+        "by_id": {int(r['id']): r for r in records},
+    }
+
+def get_auth_index(version=None):
+    # Keyed by the Users version, so it is rebuilt only when someone edits the Users tab.
+    return _auth_index(get_tab_version("Users") if version is None else version)
+
+def authenticate(username, password):
+    record = get_auth_index()["by_username"].get(username)
+    if record is None:
+        verify_password(password, _DUMMY_HASH)
+        return None
+    if not verify_password(password, record['password']):
+        return None
+
+    if not is_password_hash(record['password']):
+        update_user_row(record['id'], {"password": hash_password(password)}, expected={"password": record['password']})
+    return _session_user(record)
+
+@st.cache_resource
+def get_session_secret():
+    secret = os.environ.get("MYTRACKER_SESSION_SECRET")
+    if not secret:
+        try:
+            secret = st.secrets["session_secret"]
+        except Exception:
+            # Without a configured secret (shared by every replica), sessions only resume on this process.
+            secret = secrets.token_hex(32)
+    return secret.encode()
+
+def _session_signature(record, issued_at):
+    # Signed over the user's password hash and session nonce too, so changing the password or
+    # rotating the nonce (logout, password reset) revokes every link issued before it.
+    nonce = record.get('session_nonce')
+    payload = f"{int(record['id'])}.{int(issued_at)}.{record['password']}.{nonce if isinstance(nonce, str) else ''}"
+    return hmac.new(get_session_secret(), payload.encode(), hashlib.sha256).hexdigest()
+
+def issue_session_token(user_id):
+    record = get_auth_index()["by_id"][int(user_id)]
+    issued_at = int(time.time())
+    return f"{int(user_id)}.{issued_at}.{_session_signature(record, issued_at)}"
+
+def read_session_token(token, version=None):
+    # Returns the Users record a token was issued to, or None if it is forged, malformed, expired or revoked.
+    try:
+        user_id, issued_at, signature = token.split(".")
+        record = get_auth_index(version)["by_id"].get(int(user_id))
+        if record is None or time.time() - int(issued_at) > SESSION_TTL:
+            return None
+        if not hmac.compare_digest(_session_signature(record, issued_at), signature):
+            return None
+        return record
+    except (AttributeError, ValueError):
+        return None
+
+def start_session(user, token=None):
+    st.session_state['logged_in'] = True
+    st.session_state['user'] = user
+    st.session_state['users_version'] = get_tab_version("Users")
+    st.session_state['session_token'] = token or issue_session_token(user['id'])
+    st.query_params["session"] = st.session_state['session_token']
+
+def revoke_sessions(user_id):
+    update_user_row(user_id, {"session_nonce": secrets.token_hex(16)})
+
 # --- UI PAGES ---
 
 def page_my_timesheet(user):
@@ -175,18 +559,12 @@ def page_my_timesheet(user):
         week_start_str = str(selected_week - timedelta(days=selected_week.weekday()))
     
     week_dates = get_week_dates(selected_week - timedelta(days=selected_week.weekday()))
-    week_dates_str = [str(d) for d in week_dates]
 
     # --- LOCKING / UNLOCK LOGIC ---
-    subs_df = load_data("SubmittedWeeks")
-    is_locked = False
-    lock_status = ""
-    
-    if not subs_df.empty:
-        match = subs_df[(subs_df['user_id'] == user['id']) & (subs_df['week_start'] == week_start_str)]
-        if not match.empty:
-            is_locked = True
-            lock_status = match.iloc[0]['status']
+    week = get_week_slice(user['id'], week_start_str)
+    lock_status = week['lock_status']
+    is_locked = lock_status is not None
+    unlock_base = shown_slice_version(f"unlock_base_{week_start_str}", week['versions']['SubmittedWeeks'])
 
     if is_locked:
         if lock_status == "Unlock Requested":
@@ -195,120 +573,99 @@ def page_my_timesheet(user):
             c_lock1, c_lock2 = st.columns([3, 1])
             c_lock1.info(f"🔒 Week of {week_start_str} is submitted.")
             if c_lock2.button("🔓 Request Unlock"):
-                idx = match.index[0]
-                subs_df.at[idx, 'status'] = "Unlock Requested"
-                save_data("SubmittedWeeks", subs_df)
-                st.success("Request sent to Admin.")
-                time.sleep(1)
-                st.rerun()
+                subs_df = load_data("SubmittedWeeks")
+                request = subs_df[(subs_df['user_id'] == user['id']) & (subs_df['week_start'] == week_start_str)].head(1).copy()
+                request['status'] = "Unlock Requested"
+                if save_slice("SubmittedWeeks", user['id'], week_start_str, request, unlock_base) is not None:
+                    st.success("Request sent to Admin.")
+                    time.sleep(1)
+                    st.rerun()
 
-    clients_df = load_data("Clients")
-    time_df = load_data("TimeEntries")
-    assets_df = load_data("Assets")
-    creative_types_df = load_data("CreativeTypes")
-    
-    current_entries = pd.DataFrame()
-    if not time_df.empty:
-        current_entries = time_df[(time_df['user_id'] == user['id']) & (time_df['week_start'] == week_start_str)]
-    
-    active_client_ids = []
-    if not current_entries.empty:
-        active_client_ids = current_entries['client_id'].unique().tolist()
+    # Each section below is a fragment, so interacting with one only reruns that section.
+    timesheet_grid(user, week_start_str, week_dates, is_locked)
+    production_list(user, week_dates, is_locked)
+    final_submission(user, week_start_str, is_locked)
 
-    if 'ts_clients' not in st.session_state or st.session_state.get('ts_week') != week_start_str:
-        st.session_state['ts_clients'] = active_client_ids
-        st.session_state['ts_week'] = week_start_str
+@st.fragment
+def timesheet_grid(user, week_start_str, week_dates, is_locked):
+    clients_df = load_data("Clients")
+    week = get_week_slice(user['id'], week_start_str)
+    current_entries = week['time']
+    base = shown_slice_version(f"ts_grid_base_{week_start_str}", week['versions']['TimeEntries'])
 
-    if not is_locked:
-        if clients_df.empty:
-            st.warning("No clients found. Ask an Admin to add clients.")
-        else:
-            avail_clients = clients_df[~clients_df['id'].isin(st.session_state['ts_clients'])]
-            if not avail_clients.empty:
-                c1, c2 = st.columns([3, 1], vertical_alignment="bottom")
-                add_c = c1.selectbox("Add Client", avail_clients['name'], key="add_c_sel")
-                if c2.button("Add Row"):
-                    cid = int(avail_clients[avail_clients['name'] == add_c]['id'].values[0])
-                    st.session_state['ts_clients'].append(cid)
-                    st.rerun()
+    if clients_df.empty and not is_locked:
+        st.warning("No clients found. Ask an Admin to add clients.")
 
-    st.write("")
-    cols = st.columns([3] + [1]*7 + [1] + [0.5])
-    cols[0].markdown("**Client**")
+    # One editable grid: clients as rows, days as columns.
     days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-    for i, d in enumerate(week_dates): cols[i+1].markdown(f"**{d.day} {days[i]}**")
-    cols[8].markdown("**Total**")
-    st.divider()
+    week_dates_str = [str(d) for d in week_dates]
+    day_cols = [f"{d.day} {days[i]}" for i, d in enumerate(week_dates)]
+    c_names = dict(zip(clients_df['id'], clients_df['name'])) if not clients_df.empty else {}
 
-    grand_total = 0
-    with st.form("ts_grid"):
-        if not st.session_state['ts_clients']:
-            st.write("No clients added to this week.")
-        
-        for i, cid in enumerate(list(st.session_state['ts_clients'])):
-            c_name_row = clients_df[clients_df['id'] == cid]
-            c_name = c_name_row.iloc[0]['name'] if not c_name_row.empty else "Unknown"
+    hours = current_entries.pivot_table(index='client_id', columns='date', values='hours', aggfunc='sum', fill_value=0.0)
+    hours = hours.reindex(columns=week_dates_str, fill_value=0.0).astype(float)
+    hours.columns = day_cols
+    grid = hours.reset_index()
+    grid.insert(0, 'Client', [c_names.get(cid, "Unknown") for cid in grid['client_id']])
+    grid['Total'] = grid[day_cols].sum(axis=1)
 
-            r_cols = st.columns([3] + [1]*7 + [1] + [0.5], vertical_alignment="center")
-            r_cols[0].text_input("C", value=c_name, disabled=True, label_visibility="collapsed", key=f"d_{cid}")
-            
-            row_sum = 0
-            for j, d in enumerate(week_dates):
-                val = 0.0
-                if not current_entries.empty:
-                    match = current_entries[(current_entries['client_id'] == cid) & (current_entries['date'] == str(d))]
-                    if not match.empty: val = float(match.iloc[0]['hours'])
-                
-                new_v = r_cols[j+1].number_input("H", min_value=0.0, step=0.5, value=val, key=f"h_{cid}_{d}", label_visibility="collapsed", disabled=is_locked)
-                row_sum += new_v
-            
-            r_cols[8].markdown(f"**{row_sum:g}**")
-            grand_total += row_sum
-            
-            if not is_locked:
-                if r_cols[9].form_submit_button("❌", help="Remove row", key=f"remove_btn_{i}"):
-                    st.session_state['ts_clients'].remove(cid)
-                    st.rerun()
-            
-            st.markdown("---")
-        
-        st.write(f"**Weekly Total: {grand_total:g}**")
+    client_options = clients_df['name'].tolist() if not clients_df.empty else []
+    column_config = {
+        "Client": st.column_config.SelectboxColumn("Client", options=client_options, required=True, width="medium"),
+        "Total": st.column_config.NumberColumn("Total", format="%g", disabled=True),
+    }
+    for col in day_cols:
+        column_config[col] = st.column_config.NumberColumn(col, min_value=0.0, step=0.5, default=0.0, format="%g")
+
+    with st.form("ts_grid"):
+        edited_grid = st.data_editor(
+            grid,
+            num_rows="fixed" if is_locked else "dynamic",
+            disabled=is_locked,
+            column_order=["Client"] + day_cols + ["Total"],
+            column_config=column_config,
+            hide_index=True,
+            use_container_width=True,
+            key=f"ts_grid_{week_start_str}"
+        )
+        st.write(f"**Weekly Total: {grid['Total'].sum():g}**")
+        if not is_locked:
+            st.caption("Add or remove client rows in the grid. Totals update when you save.")
         
         if st.form_submit_button("💾 Save Hours", disabled=is_locked, type="primary"):
-            new_rows = []
-            for cid in st.session_state['ts_clients']:
-                for d in week_dates:
-                    key = f"h_{cid}_{d}"
-                    if key in st.session_state:
-                        h = st.session_state[key]
-                        if h > 0:
-                            new_rows.append({
-                                "user_id": int(user['id']), "client_id": int(cid), "date": str(d), 
-                                "hours": float(h), "week_start": week_start_str
-                            })
-            
-            if not time_df.empty:
-                clean_df = time_df[~((time_df['user_id'] == user['id']) & (time_df['week_start'] == week_start_str))]
-            else:
-                clean_df = pd.DataFrame(columns=["user_id", "client_id", "date", "hours", "week_start"])
+            c_map = dict(zip(clients_df['name'], clients_df['id'])) if not clients_df.empty else {}
+            edited_grid = edited_grid.dropna(subset=['Client'])
+            # Rows whose client no longer exists keep the id they were loaded with.
+            edited_grid['client_id'] = edited_grid['Client'].map(c_map).fillna(edited_grid['client_id'])
+
+            long_df = edited_grid.dropna(subset=['client_id']).melt(id_vars='client_id', value_vars=day_cols, var_name='day', value_name='hours')
+            long_df['date'] = long_df['day'].map(dict(zip(day_cols, week_dates_str)))
+            long_df['hours'] = pd.to_numeric(long_df['hours'], errors='coerce').fillna(0.0)
+            new_df = long_df.groupby(['client_id', 'date'], as_index=False)['hours'].sum()
+            new_df = new_df[new_df['hours'] > 0]
+            new_df['client_id'] = new_df['client_id'].astype(int)
+            new_df['user_id'] = int(user['id'])
+            new_df['week_start'] = week_start_str
             
-            final_df = pd.concat([clean_df, pd.DataFrame(new_rows)], ignore_index=True) if new_rows else clean_df
-            save_data("TimeEntries", final_df)
-            st.success("Saved Hours!")
-            st.rerun()
+            if save_slice("TimeEntries", user['id'], week_start_str, new_df[REQUIRED_TABS["TimeEntries"]], base) is not None:
+                st.success(f"Saved Hours! Weekly Total: {new_df['hours'].sum():g}")
+                # Saved hours decide whether the week can be submitted, so rerun the whole page.
+                st.rerun()
 
+@st.fragment
+def production_list(user, week_dates, is_locked):
     # --- PRODUCTION LIST (EXPANDED) ---
     st.divider()
     st.subheader("📦 Production List")
     st.caption("Log details of assets produced. Please use full URLs for links (e.g., https://...)")
 
-    prod_df = load_data("ProductionEntries")
-    
-    current_prod = pd.DataFrame()
-    if not prod_df.empty:
-        mask_user = prod_df['user_id'] == user['id']
-        mask_date = prod_df['date'].isin(week_dates_str)
-        current_prod = prod_df[mask_user & mask_date].copy()
+    week_dates_str = [str(d) for d in week_dates]
+    clients_df = load_data("Clients")
+    assets_df = load_data("Assets")
+    creative_types_df = load_data("CreativeTypes")
+    week = get_week_slice(user['id'], week_dates_str[0])
+    current_prod = week['prod']
+    base = shown_slice_version(f"prod_base_{week_dates_str[0]}", week['versions']['ProductionEntries'])
 
     display_data = []
     if not current_prod.empty:
@@ -394,31 +751,29 @@ def page_my_timesheet(user):
                             "creative_type_id": int(ctid)
                         })
             
-            if not prod_df.empty:
-                mask_delete = (prod_df['user_id'] == user['id']) & (prod_df['date'].isin(week_dates_str))
-                prod_db_clean = prod_df[~mask_delete]
-            else:
-                prod_db_clean = pd.DataFrame(columns=REQUIRED_TABS["ProductionEntries"])
+            new_prod_df = pd.DataFrame(new_prod_rows, columns=REQUIRED_TABS["ProductionEntries"])
+            if save_slice("ProductionEntries", user['id'], week_dates_str[0], new_prod_df, base) is not None:
+                # --- TRIGGERS ASSET LIBRARY SYNC ---
+                update_asset_library()
 
-            final_prod_db = pd.concat([prod_db_clean, pd.DataFrame(new_prod_rows)], ignore_index=True)
-            save_data("ProductionEntries", final_prod_db)
-            
-            # --- TRIGGERS ASSET LIBRARY SYNC ---
-            update_asset_library()
-            
-            st.success("Assets List Updated!")
-            time.sleep(1)
-            st.rerun()
+                st.success("Assets List Updated!")
+                time.sleep(1)
+                st.rerun(scope="fragment")
 
+@st.fragment
+def final_submission(user, week_start_str, is_locked):
     st.divider()
     st.markdown("### Final Submission")
+    week = get_week_slice(user['id'], week_start_str)
+    grand_total = week['time']['hours'].sum()
+    base = shown_slice_version(f"submit_base_{week_start_str}", week['versions']['SubmittedWeeks'])
+
     if grand_total > 0:
         if st.button("✅ Submit Timesheet", type="primary", disabled=is_locked):
             new_sub = {"user_id": int(user['id']), "week_start": week_start_str, "status": "Submitted", "submitted_at": str(datetime.datetime.now())}
-            subs_df = pd.concat([subs_df, pd.DataFrame([new_sub])], ignore_index=True)
-            save_data("SubmittedWeeks", subs_df)
-            st.balloons()
-            st.rerun()
+            if save_slice("SubmittedWeeks", user['id'], week_start_str, pd.DataFrame([new_sub]), base) is not None:
+                st.balloons()
+                st.rerun()
     else:
         st.caption("Save hours (> 0) to enable submission.")
 
@@ -450,27 +805,6 @@ def page_workload_details(user):
         if not filtered_time.empty:
             filtered_time = filtered_time[filtered_time['user_id'] == user['id']]
 
-    st.divider()
-    st.subheader("Statistics by Employee")
-    if not filtered_time.empty and not users_df.empty:
-        emp_merge = pd.merge(filtered_time, users_df, left_on='user_id', right_on='id')
-        emp_pivot = emp_merge.pivot_table(index='name', columns='date', values='hours', aggfunc='sum', fill_value=0)
-        emp_pivot['Total'] = emp_pivot.sum(axis=1)
-        st.dataframe(emp_pivot, use_container_width=True)
-    else:
-        st.info("No time data.")
-
-    st.divider()
-    st.subheader("Statistics by Client")
-    if not filtered_time.empty and not clients_df.empty:
-        cli_merge = pd.merge(filtered_time, clients_df, left_on='client_id', right_on='id')
-        cli_pivot = cli_merge.pivot_table(index='name', columns='date', values='hours', aggfunc='sum', fill_value=0)
-        cli_pivot['Total'] = cli_pivot.sum(axis=1)
-        st.dataframe(cli_pivot, use_container_width=True)
-    else:
-        st.info("No time data.")
-
-    st.divider()
     if not prod_df.empty and 'date' in prod_df.columns:
         p_mask = (prod_df['date'] >= str(start_date)) & (prod_df['date'] <= str(end_date))
         filtered_prod = prod_df.loc[p_mask].copy()
@@ -481,33 +815,14 @@ def page_workload_details(user):
         if not filtered_prod.empty:
             filtered_prod = filtered_prod[filtered_prod['user_id'] == user['id']]
 
+    # Each section below is a fragment, so e.g. picking a client only reruns "Assets per Client".
+    employee_stats(filtered_time, users_df)
+    client_stats(filtered_time, clients_df)
+
+    st.divider()
     # Manager Export View
     if user['role'] == 'Admin':
-        st.subheader("Raw Production Export")
-        st.caption("A fully mapped view of all assets produced for easy exporting/reporting.")
-        if not filtered_prod.empty:
-            export_df = filtered_prod.copy()
-            if not users_df.empty:
-                export_df = pd.merge(export_df, users_df[['id', 'name']], left_on='user_id', right_on='id', how='left').rename(columns={'name': 'Creative (Employee)'}).drop(columns=['id'])
-            if not clients_df.empty:
-                export_df = pd.merge(export_df, clients_df[['id', 'name']], left_on='client_id', right_on='id', how='left').rename(columns={'name': 'Client/Service'}).drop(columns=['id'])
-            if not assets_df.empty:
-                export_df = pd.merge(export_df, assets_df[['id', 'name']], left_on='asset_id', right_on='id', how='left').rename(columns={'name': 'Asset Category'}).drop(columns=['id'])
-            if not creative_types_df.empty:
-                export_df = pd.merge(export_df, creative_types_df[['id', 'name']], left_on='creative_type_id', right_on='id', how='left').rename(columns={'name': 'Creative Type'}).drop(columns=['id'])
-            
-            clean_columns = {
-                'date': 'Delivered On', 'title': 'Title Asset Pack', 'source_link': 'Source Link', 
-                'ext_link': 'External Link', 'amount': 'Qty', 'time_spent': 'Time Spent (Hrs)'
-            }
-            export_df = export_df.rename(columns=clean_columns)
-            
-            cols_to_display = ['Delivered On', 'Title Asset Pack', 'Source Link', 'External Link', 'Client/Service', 'Qty', 'Time Spent (Hrs)', 'Creative Type', 'Asset Category', 'Creative (Employee)']
-            existing_cols = [c for c in cols_to_display if c in export_df.columns]
-            
-            st.dataframe(export_df[existing_cols], use_container_width=True)
-        else:
-            st.info("No production data available for this month.")
+        production_export(filtered_prod, users_df, clients_df, assets_df, creative_types_df)
         st.divider()
 
     col_a, col_b = st.columns(2)
@@ -522,30 +837,88 @@ def page_workload_details(user):
             st.info("No assets produced.")
 
     with col_b:
-        st.markdown("**Assets per Client**")
+        assets_per_client(filtered_prod, clients_df, assets_df)
+
+@st.fragment
+def employee_stats(filtered_time, users_df):
+    st.divider()
+    st.subheader("Statistics by Employee")
+    if not filtered_time.empty and not users_df.empty:
+        emp_merge = pd.merge(filtered_time, users_df, left_on='user_id', right_on='id')
+        emp_pivot = emp_merge.pivot_table(index='name', columns='date', values='hours', aggfunc='sum', fill_value=0)
+        emp_pivot['Total'] = emp_pivot.sum(axis=1)
+        st.dataframe(emp_pivot, use_container_width=True)
+    else:
+        st.info("No time data.")
+
+@st.fragment
+def client_stats(filtered_time, clients_df):
+    st.divider()
+    st.subheader("Statistics by Client")
+    if not filtered_time.empty and not clients_df.empty:
+        cli_merge = pd.merge(filtered_time, clients_df, left_on='client_id', right_on='id')
+        cli_pivot = cli_merge.pivot_table(index='name', columns='date', values='hours', aggfunc='sum', fill_value=0)
+        cli_pivot['Total'] = cli_pivot.sum(axis=1)
+        st.dataframe(cli_pivot, use_container_width=True)
+    else:
+        st.info("No time data.")
+
+@st.fragment
+def production_export(filtered_prod, users_df, clients_df, assets_df, creative_types_df):
+    st.subheader("Raw Production Export")
+    st.caption("A fully mapped view of all assets produced for easy exporting/reporting.")
+    if not filtered_prod.empty:
+        export_df = filtered_prod.copy()
+        if not users_df.empty:
+            export_df = pd.merge(export_df, users_df[['id', 'name']], left_on='user_id', right_on='id', how='left').rename(columns={'name': 'Creative (Employee)'}).drop(columns=['id'])
         if not clients_df.empty:
-            c_list = clients_df['name'].tolist()
-            sel_cli = st.selectbox("Select Client", c_list)
-            
-            if not filtered_prod.empty and not assets_df.empty:
-                cid_row = clients_df[clients_df['name'] == sel_cli]
-                if not cid_row.empty:
-                    cid = cid_row['id'].values[0]
-                    c_prod = filtered_prod[filtered_prod['client_id'] == cid]
-                    if not c_prod.empty:
-                        ca_merge = pd.merge(c_prod, assets_df, left_on='asset_id', right_on='id')
-                        ca_stats = ca_merge.groupby('name')['amount'].sum().reset_index()
-                        ca_stats.columns = ['Asset Category', 'Amount']
-                        st.dataframe(ca_stats, use_container_width=True, hide_index=True)
-                    else:
-                        st.info(f"No assets for {sel_cli}")
+            export_df = pd.merge(export_df, clients_df[['id', 'name']], left_on='client_id', right_on='id', how='left').rename(columns={'name': 'Client/Service'}).drop(columns=['id'])
+        if not assets_df.empty:
+            export_df = pd.merge(export_df, assets_df[['id', 'name']], left_on='asset_id', right_on='id', how='left').rename(columns={'name': 'Asset Category'}).drop(columns=['id'])
+        if not creative_types_df.empty:
+            export_df = pd.merge(export_df, creative_types_df[['id', 'name']], left_on='creative_type_id', right_on='id', how='left').rename(columns={'name': 'Creative Type'}).drop(columns=['id'])
+        
+        clean_columns = {
+            'date': 'Delivered On', 'title': 'Title Asset Pack', 'source_link': 'Source Link', 
+            'ext_link': 'External Link', 'amount': 'Qty', 'time_spent': 'Time Spent (Hrs)'
+        }
+        export_df = export_df.rename(columns=clean_columns)
+        
+        cols_to_display = ['Delivered On', 'Title Asset Pack', 'Source Link', 'External Link', 'Client/Service', 'Qty', 'Time Spent (Hrs)', 'Creative Type', 'Asset Category', 'Creative (Employee)']
+        existing_cols = [c for c in cols_to_display if c in export_df.columns]
+        
+        st.dataframe(export_df[existing_cols], use_container_width=True)
+    else:
+        st.info("No production data available for this month.")
+
+@st.fragment
+def assets_per_client(filtered_prod, clients_df, assets_df):
+    st.markdown("**Assets per Client**")
+    if not clients_df.empty:
+        c_list = clients_df['name'].tolist()
+        sel_cli = st.selectbox("Select Client", c_list)
+        
+        if not filtered_prod.empty and not assets_df.empty:
+            cid_row = clients_df[clients_df['name'] == sel_cli]
+            if not cid_row.empty:
+                cid = cid_row['id'].values[0]
+                c_prod = filtered_prod[filtered_prod['client_id'] == cid]
+                if not c_prod.empty:
+                    ca_merge = pd.merge(c_prod, assets_df, left_on='asset_id', right_on='id')
+                    ca_stats = ca_merge.groupby('name')['amount'].sum().reset_index()
+                    ca_stats.columns = ['Asset Category', 'Amount']
+                    st.dataframe(ca_stats, use_container_width=True, hide_index=True)
                 else:
-                    st.warning("Client error.")
-        else:
-            st.warning("No clients.")
+                    st.info(f"No assets for {sel_cli}")
+            else:
+                st.warning("Client error.")
+    else:
+        st.warning("No clients.")
 
 def page_submitted_timesheets(user):
     st.header("🗂 Submitted Timesheets")
+    # Read before the tab itself, so an unlock is refused if the week changed after the list was shown.
+    sub_versions = get_shared_store().scope_versions("SubmittedWeeks")
     subs_df = load_data("SubmittedWeeks")
     users_df = load_data("Users")
     time_df = load_data("TimeEntries")
@@ -581,14 +954,15 @@ def page_submitted_timesheets(user):
         c4.write(row['status'])
         
         if user['role'] == "Admin" and row['status'] == "Unlock Requested":
+            target_uid = row['user_id']
+            target_week = row['week_start']
+            base = shown_slice_version(f"unl_base_{int(target_uid)}_{target_week}",
+                                       sub_versions.get(_slice_scope(target_uid, target_week), 0))
             if c5.button("🔓 UNLOCK", key=f"unl_{idx}", type="primary"):
-                target_uid = row['user_id']
-                target_week = row['week_start']
-                subs_df = subs_df[~((subs_df['user_id'] == target_uid) & (subs_df['week_start'] == target_week))]
-                save_data("SubmittedWeeks", subs_df)
-                st.success("Unlocked successfully!")
-                time.sleep(1)
-                st.rerun()
+                if save_slice("SubmittedWeeks", target_uid, target_week, pd.DataFrame(columns=REQUIRED_TABS["SubmittedWeeks"]), base) is not None:
+                    st.success("Unlocked successfully!")
+                    time.sleep(1)
+                    st.rerun()
         else:
             if c5.button("Open", key=f"op_{idx}"):
                 st.session_state['view_sub_id'] = row['user_id']
@@ -629,7 +1003,7 @@ def page_manage_users(current_user):
                 st.error("Username taken")
             else:
                 new_id = generate_id(users_df)
-                new_u = {"id": new_id, "name": name, "username": uname, "password": pwd, "role": "Employee", "date_added": str(date.today())}
+                new_u = {"id": new_id, "name": name, "username": uname, "password": hash_password(pwd), "role": "Employee", "date_added": str(date.today()), "session_nonce": secrets.token_hex(16)}
                 save_data("Users", pd.concat([users_df, pd.DataFrame([new_u])], ignore_index=True))
                 st.success("User Added")
                 st.rerun()
@@ -639,13 +1013,16 @@ def page_manage_users(current_user):
     
     if not users_df.empty:
         display_df = users_df.copy()
+        # Stored passwords are hashes; the column is only used to type a new one.
+        display_df['password'] = ""
         edited_df = st.data_editor(
             display_df,
             column_config={
                 "id": st.column_config.NumberColumn(disabled=True),
                 "username": st.column_config.TextColumn(disabled=True, help="Usernames cannot be changed."),
-                "password": st.column_config.TextColumn(disabled=False),
+                "password": st.column_config.TextColumn(disabled=False, help="Type a new password to reset it. Leave blank to keep the current one."),
                 "role": st.column_config.SelectboxColumn(options=["Admin", "Employee"], required=True),
+                "session_nonce": None,
             },
             num_rows="dynamic",
             key="user_editor",
@@ -653,6 +1030,14 @@ def page_manage_users(current_user):
         )
 
         if st.button("💾 Save User Changes"):
+            current_hashes = dict(zip(users_df['id'], users_df['password']))
+            reset = edited_df['password'].map(lambda p: isinstance(p, str) and bool(p))
+            edited_df['password'] = [
+                hash_password(p) if is_reset else current_hashes.get(uid, "")
+                for uid, p, is_reset in zip(edited_df['id'], edited_df['password'], reset)
+            ]
+            # A reset also logs the user out everywhere.
+            edited_df.loc[reset, 'session_nonce'] = [secrets.token_hex(16) for _ in range(reset.sum())]
             if len(edited_df) < len(users_df):
                 deleted_ids = set(users_df['id']) - set(edited_df['id'])
                 if current_user['id'] in deleted_ids:
@@ -731,20 +1116,18 @@ def page_admin_data():
 def page_my_profile(user):
     st.header("👤 My Profile")
     st.caption("Update your personal details here.")
-    users_df = load_data("Users")
-    
     with st.form("upd_me"):
         n_name = st.text_input("Name", value=user['name'])
         n_user = st.text_input("Username", value=user['username'], disabled=True, help="Contact Admin to change username.")
-        n_pass = st.text_input("New Password", value=user['password'], type="password")
+        n_pass = st.text_input("New Password", type="password", help="Leave blank to keep your current password.")
         if st.form_submit_button("Save Changes"):
-            idx = users_df[users_df['id'] == user['id']].index[0]
-            users_df.at[idx, 'name'] = n_name
-            users_df.at[idx, 'password'] = n_pass
-            save_data("Users", users_df)
+            updates = {"name": n_name}
+            if n_pass:
+                # Revokes links issued under the old password; start_session gives this browser a new one.
+                updates.update(password=hash_password(n_pass), session_nonce=secrets.token_hex(16))
+            update_user_row(user['id'], updates)
             user['name'] = n_name
-            user['password'] = n_pass
-            st.session_state['user'] = user
+            start_session(user)
             st.success("Profile Updated!")
             time.sleep(1)
             st.rerun()
@@ -752,31 +1135,55 @@ def page_my_profile(user):
 # --- MAIN ---
 
 def main():
-    try:
-        init_db()
-    except Exception:
-        pass
-    
+    # Fragment reruns skip main() entirely; full reruns only need to check the tabs once per session.
+    if not st.session_state.get('db_ready'):
+        try:
+            init_db()
+            st.session_state['db_ready'] = True
+        except Exception:
+            pass
+    flush_pending_tabs()
+
     if 'logged_in' not in st.session_state:
         st.session_state['logged_in'] = False
 
+    # A browser refresh starts a new session; resume it from the signed token in the URL.
+    if not st.session_state['logged_in'] and "session" in st.query_params:
+        token = st.query_params["session"]
+        record = read_session_token(token)
+        if record is not None:
+            start_session(_session_user(record), token)
+        else:
+            del st.query_params["session"]
+
     if not st.session_state['logged_in']:
         st.title("MyTracker Login")
         with st.form("login"):
             u = st.text_input("Username")
             p = st.text_input("Password", type="password")
             if st.form_submit_button("Log In"):
-                users_df = load_data("Users")
-                if not users_df.empty:
-                    match = users_df[(users_df['username'] == u) & (users_df['password'] == p)]
-                    if not match.empty:
-                        st.session_state['logged_in'] = True
-                        st.session_state['user'] = match.iloc[0].to_dict()
+                if not get_auth_index()["by_username"]:
+                    st.error("Database Empty")
+                else:
+                    user = authenticate(u, p)
+                    if user is not None:
+                        start_session(user)
                         st.rerun()
                     else: st.error("Invalid Login")
-                else: st.error("Database Empty")
         return
 
+    # The token is re-checked on every run (a cheap lookup in the cached auth index): it expires, and
+    # deleting the user, resetting their password or logging out elsewhere revokes it.
+    users_version = get_tab_version("Users")
+    record = read_session_token(st.session_state.get('session_token'), users_version)
+    if record is None:
+        st.session_state['logged_in'] = False
+        st.query_params.clear()
+        st.rerun()
+    if st.session_state.get('users_version') != users_version:
+        st.session_state['user'] = _session_user(record)
+        st.session_state['users_version'] = users_version
+
     user = st.session_state['user']
     role = user['role']
     
@@ -790,7 +1197,9 @@ def main():
             
         page = st.radio("Menu", opts)
         if st.button("Logout"):
+            revoke_sessions(user['id'])
             st.session_state['logged_in'] = False
+            st.query_params.clear()
             st.rerun()
 
     if page == "My timesheet": page_my_timesheet(user)